@@ -1,80 +1,154 @@
 import sys
 import os
+import posixpath
 import socket
 import shlex
 import argparse
 import csv
-import base64
+import binascii
+import getpass
+import io
+import contextlib
+
+try:
+    import readline  # Редактирование строки и история команд в input()
+except ImportError:  # Модуля нет, например, на Windows
+    readline = None
+
+try:
+    _USER = os.getlogin()
+except OSError:
+    try:
+        _USER = getpass.getuser()
+    except (OSError, KeyError):  # Нет ни LOGNAME/USER, ни записи в passwd
+        _USER = "user"
+_HOST = socket.gethostname()
+_PROMPT_PREFIX = f"{_USER}@{_HOST}:"
+
+_SCRIPT_BUFFER_SIZE = 1 << 16
+_SCRIPT_READ_ALL_LIMIT = 1 << 20
 
 class VFSNode:
-    def __init__(self, name, node_type, content=None):
+    __slots__ = ('name', 'type', 'content', 'children', 'encoded')
+
+    def __init__(self, name, node_type, content=None, encoded=None):
         self.name = name
         self.type = node_type  # 'file' или 'dir'
         self.content = content
         self.children = {}
+        self.encoded = encoded  # base64 из CSV, декодируется при первом чтении
+
+    def read(self):
+        if self.encoded is not None:
+            try:
+                self.content = binascii.a2b_base64(self.encoded).decode('utf-8')
+            except ValueError as e:  # binascii.Error, UnicodeDecodeError
+                self.content = f"Error decoding content: {e}"
+            self.encoded = None
+        return self.content
 
 class VFS:
     def __init__(self):
         self.root = VFSNode("", "dir")
         self.current_path = "/"
+        # Плоский индекс: нормализованный абсолютный путь -> узел
+        self.index = {"/": self.root}
 
     def load_from_csv(self, csv_path):
         try:
-            with open(csv_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
+            with open(csv_path, 'r', encoding='utf-8', newline='', buffering=1 << 20) as file:
+                reader = csv.reader(file)
+                header = next(reader, None)
+                if header is None:
+                    return  # Пустой CSV - пустая VFS
+                path_idx = header.index('path')
+                type_idx = header.index('type')
+                content_idx = header.index('content') if 'content' in header else None
+                min_len = max(path_idx, type_idx) + 1
                 for row in reader:
-                    path = row['path']
-                    node_type = row['type']
-                    content = row.get('content', '')
+                    # Пустые строки и строки без path/type пропускаем
+                    if len(row) < min_len:
+                        continue
+                    path = row[path_idx]
+                    node_type = row[type_idx]
+                    # Колонка content может отсутствовать в строке
+                    if content_idx is not None and content_idx < len(row):
+                        content = row[content_idx]
+                    else:
+                        content = ''
                     
                     if node_type == 'file' and content:
-                        try:
-                            content = base64.b64decode(content).decode('utf-8')
-                        except Exception as e:
-                            content = f"Error decoding content: {e}"
-                    
-                    self._add_node(path, node_type, content)
+                        self._add_node(path, node_type, encoded=content)
+                    else:
+                        self._add_node(path, node_type, content)
         except FileNotFoundError:
             raise Exception(f"VFS file not found: {csv_path}")
         except Exception as e:
             raise Exception(f"Error loading VFS: {e}")
 
-    def _add_node(self, path, node_type, content):
+    def _add_node(self, path, node_type, content=None, encoded=None):
         if path == "/":
             return
         
-        parts = [p for p in path.split('/') if p]
-        current = self.root
+        parts = [sys.intern(p) for p in path.split('/') if p]
+        current_path = "/" + "/".join(parts[:-1])
         
-        for part in parts[:-1]:
-            if part not in current.children:
-                current.children[part] = VFSNode(part, "dir")
-            current = current.children[part]
+        # CSV обычно идёт от родителей к детям, поэтому родитель уже в индексе
+        current = self.index.get(current_path)
+        if current is None or current.type != "dir":
+            current = self.root
+            current_path = ""
+            for part in parts[:-1]:
+                current_path = f"{current_path}/{part}"
+                node = current.children.get(part)
+                if node is None:
+                    node = VFSNode(part, "dir")
+                    current.children[part] = node
+                    self.index[current_path] = node
+                elif node.type != "dir":
+                    return  # Внутри файла узлов быть не может
+                current = node
         
         name = parts[-1]
-        current.children[name] = VFSNode(name, node_type, content)
+        node_path = "/" + "/".join(parts)
+        node = self.index.get(node_path)
+        if node is not None:
+            # Повторная строка для уже загруженного пути: обновляем узел на месте,
+            # чтобы не потерять его потомков в индексе
+            if node_type != "dir":
+                self._drop_children(node_path, node)
+            node.type = node_type
+            node.content = content
+            node.encoded = encoded
+            return
+        
+        node = VFSNode(name, node_type, content, encoded)
+        current.children[name] = node
+        self.index[node_path] = node
+
+    def _drop_children(self, path, node):
+        for name, child in node.children.items():
+            child_path = f"{path}/{name}"
+            del self.index[child_path]
+            self._drop_children(child_path, child)
+        node.children = {}
 
     def get_current_dir(self):
-        parts = [p for p in self.current_path.split('/') if p]
-        current = self.root
-        for part in parts:
-            if part in current.children:
-                current = current.children[part]
-            else:
-                return None
-        return current
+        return self.index.get(self.current_path)
 
 def get_prompt(custom_prompt=None, vfs=None):
     if custom_prompt:
         return custom_prompt
-    username = os.getlogin()
-    hostname = socket.gethostname()
     current_dir = vfs.current_path if vfs else "~"
-    return f"{username}@{hostname}:{current_dir}$ "
+    return f"{_PROMPT_PREFIX}{current_dir}$ "
 
 def handle_command(command_line, vfs):
     try:
-        parts = shlex.split(command_line)
+        # Кавычки и экранирование разбираем через shlex, остальное - обычным split
+        if not any(c in command_line for c in ('"', "'", "\\")):
+            parts = command_line.split()
+        else:
+            parts = shlex.split(command_line)
         if not parts:
             return ""
         
@@ -84,12 +158,11 @@ def handle_command(command_line, vfs):
         if cmd == "exit":
             print("Exiting emulator.")
             sys.exit(0)
-        elif cmd == "ls":
-            return handle_ls(args, vfs)
-        elif cmd == "cd":
-            return handle_cd(args, vfs)
-        else:
+        
+        handler = _COMMANDS.get(cmd)
+        if handler is None:
             return f"Command not found: {cmd}"
+        return handler(args, vfs)
     except ValueError as e:
         return f"Parsing error: {e}"
 
@@ -126,44 +199,60 @@ def handle_cd(args, vfs):
         else:
             new_path = f"{current}/{target_path}"
     
-    # Нормализация пути
-    parts = [p for p in new_path.split('/') if p and p != '.']
-    resolved_parts = []
-    for part in parts:
-        if part == "..":
-            if resolved_parts:
-                resolved_parts.pop()
-        else:
-            resolved_parts.append(part)
-    
-    new_path = "/" + "/".join(resolved_parts)
+    # Нормализация пути (ведущие "//" normpath сохраняет, поэтому убираем их)
+    new_path = posixpath.normpath("/" + new_path.lstrip("/"))
     
     # Проверка существования пути
-    test_parts = [p for p in new_path.split('/') if p]
-    current = vfs.root
-    for part in test_parts:
-        if part in current.children and current.children[part].type == "dir":
-            current = current.children[part]
-        else:
-            return f"cd: {target_path}: No such directory"
+    node = vfs.index.get(new_path)
+    if not node or node.type != "dir":
+        return f"cd: {target_path}: No such directory"
     
     vfs.current_path = new_path
     return ""
 
+_COMMANDS = {
+    "ls": handle_ls,
+    "cd": handle_cd,
+}
+
 def execute_script(script_path, vfs):
+    # Вывод скрипта (включая print из команд) копится в буфере
+    # и выводится пачками, а не отдельной записью на каждую строку
+    stdout = sys.stdout
+    buf = io.StringIO()
+    # Приглашение пересобирается только после смены текущей директории
+    prompt = get_prompt(vfs=vfs)
+    prompt_path = vfs.current_path if vfs else None
     try:
-        with open(script_path, 'r') as file:
-            for line in file:
-                line = line.strip()
-                if line and not line.startswith('#'):  # Поддержка комментариев
-                    print(f"{get_prompt(vfs=vfs)} {line}")
-                    output = handle_command(line, vfs)
-                    if output:
-                        print(output)
-    except FileNotFoundError:
-        print(f"Error: Script file {script_path} not found.")
-    except Exception as e:
-        print(f"Error executing script: {e}")
+        with contextlib.redirect_stdout(buf):
+            try:
+                with open(script_path, 'r', buffering=1 << 20) as file:
+                    # Небольшой скрипт читаем целиком, большой - построчно
+                    if os.fstat(file.fileno()).st_size <= _SCRIPT_READ_ALL_LIMIT:
+                        lines = file.read().split('\n')
+                    else:
+                        lines = file
+                    for line in lines:
+                        line = line.strip()
+                        if line and not line.startswith('#'):  # Поддержка комментариев
+                            if vfs and vfs.current_path != prompt_path:
+                                prompt = get_prompt(vfs=vfs)
+                                prompt_path = vfs.current_path
+                            print(f"{prompt} {line}")
+                            output = handle_command(line, vfs)
+                            if output:
+                                print(output)
+                            if buf.tell() >= _SCRIPT_BUFFER_SIZE:
+                                stdout.write(buf.getvalue())
+                                buf.seek(0)
+                                buf.truncate()
+            except FileNotFoundError:
+                print(f"Error: Script file {script_path} not found.")
+            except Exception as e:
+                print(f"Error executing script: {e}")
+    finally:
+        # Сбрасываем остаток и при выходе по команде exit
+        stdout.write(buf.getvalue())
 
 def main():
     parser = argparse.ArgumentParser(description="Shell Emulator (Variant 6)")
@@ -191,8 +280,12 @@ def main():
         execute_script(args.script, vfs)
     else:
         print("Shell Emulator (Variant 6, Stage 3 - VFS)")
+        prompt = get_prompt(args.prompt, vfs)
+        prompt_path = vfs.current_path if vfs else None
         while True:
-            prompt = get_prompt(args.prompt, vfs)
+            if vfs and vfs.current_path != prompt_path:
+                prompt = get_prompt(args.prompt, vfs)
+                prompt_path = vfs.current_path
             command_line = input(prompt).strip()
             output = handle_command(command_line, vfs)
             if output: